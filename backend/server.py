@@ -1,32 +1,28 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request
+from pymongo.errors import DuplicateKeyError
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from typing import List, Literal, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 import asyncio
+import html
+import socket
 import resend
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Resend configuration
-resend.api_key = os.environ.get('RESEND_API_KEY', '')
-SENDER_EMAIL = os.environ.get('SENDER_EMAIL', 'onboarding@resend.dev')
-
-# Create the main app without a prefix
-app = FastAPI()
+# Multi-worker coordination
+LEASE_TTL_SECONDS = int(os.environ.get('LEASE_TTL_SECONDS', '30'))
+LEASE_RENEW_SECONDS = int(os.environ.get('LEASE_RENEW_SECONDS', '10'))
+REMINDER_SCAN_INTERVAL = int(os.environ.get('REMINDER_SCAN_INTERVAL', '3600'))
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -105,6 +101,298 @@ class ReminderResponse(BaseModel):
     days_since_update: int
     amount: float
 
+class Customer(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    email: str
+    name: str
+    order_count: int = 0
+    lifetime_value: float = 0.0
+    first_order_at: Optional[datetime] = None
+    last_order_at: Optional[datetime] = None
+    last_touchpoint: Optional[datetime] = None
+
+class CustomerDetail(Customer):
+    orders: List[Order] = Field(default_factory=list)
+
+
+# Customer rollups
+def normalize_order(order: dict) -> dict:
+    """Fill in fields missing from legacy order documents."""
+    if isinstance(order['created_at'], str):
+        order['created_at'] = datetime.fromisoformat(order['created_at'])
+    if isinstance(order['last_updated'], str):
+        order['last_updated'] = datetime.fromisoformat(order['last_updated'])
+    if 'order_number' not in order or not order['order_number']:
+        order['order_number'] = f"ORD-{order['id'][:8]}"
+    if 'product_items' in order and isinstance(order['product_items'], str):
+        order['product_items'] = [{
+            "name": order['product_items'],
+            "quantity": order.get('quantity', 1),
+            "sku": order.get('sku', '')
+        }]
+    if 'product_items' not in order:
+        order['product_items'] = []
+    if 'custom_reminder' not in order:
+        order['custom_reminder'] = {"days": 0, "time": "", "note": "", "is_active": False}
+    if 'touchpoints' in order and 'notes' not in order['touchpoints']:
+        order['touchpoints']['notes'] = ""
+    if 'is_archived' not in order:
+        order['is_archived'] = False
+    return order
+
+def customer_rollup_pipeline(match: Optional[dict] = None) -> list:
+    """Aggregate orders into one summary document per customer email."""
+    # Legacy orders without a string email can't be keyed to a customer
+    pipeline = [{"$match": {"customer_email": {"$type": "string"}, **(match or {})}}]
+    pipeline += [
+        {"$sort": {"created_at": 1}},
+        {"$group": {
+            "_id": "$customer_email",
+            "name": {"$last": "$customer_name"},
+            "order_count": {"$sum": 1},
+            # Legacy amounts may be stored as numeric strings
+            "lifetime_value": {"$sum": {"$convert": {"input": "$amount", "to": "double", "onError": 0, "onNull": 0}}},
+            "first_order_at": {"$min": "$created_at"},
+            "last_order_at": {"$max": "$created_at"},
+            "last_touchpoint": {"$max": "$last_updated"},
+        }},
+        {"$project": {
+            "_id": 0,
+            "email": "$_id",
+            "name": 1,
+            "order_count": 1,
+            "lifetime_value": 1,
+            "first_order_at": 1,
+            "last_order_at": 1,
+            "last_touchpoint": 1,
+        }},
+    ]
+    return pipeline
+
+async def refresh_customer(db: AsyncIOMotorDatabase, email: str, attempts: int = 5):
+    """Recompute a single customer's rollup from their orders.
+
+    Every write to a customer document bumps its `version`. The recomputed
+    rollup is only stored if the version is unchanged since the recompute
+    started; otherwise a concurrent write landed in between and we retry.
+    """
+    for _ in range(attempts):
+        current = await db.customers.find_one({"email": email}, {"_id": 0, "version": 1})
+        version = current.get('version') if current else None
+        rollups = await db.orders.aggregate(customer_rollup_pipeline({"customer_email": email})).to_list(1)
+        
+        if rollups:
+            try:
+                # A changed version fails the match, and the upsert then hits the unique email index
+                await db.customers.replace_one(
+                    {"email": email, "version": version},
+                    {**rollups[0], "version": (version or 0) + 1},
+                    upsert=True
+                )
+                return
+            except DuplicateKeyError:
+                continue
+        
+        if current is None:
+            return
+        result = await db.customers.delete_one({"email": email, "version": version})
+        if result.deleted_count:
+            return
+    
+    logger.warning(f"Gave up recomputing customer rollup for {email} after {attempts} attempts")
+
+async def rebuild_customers(db: AsyncIOMotorDatabase) -> int:
+    """Rebuild the customers collection from every existing order.
+
+    Rollups are replaced wholesale, so run this while order writes are quiet.
+    Returns the number of customers afterwards.
+    """
+    pipeline = customer_rollup_pipeline() + [
+        {"$merge": {"into": "customers", "on": "email", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+    await db.orders.aggregate(pipeline).to_list(None)
+    
+    # Drop customers whose orders are all gone
+    emails = await db.orders.distinct("customer_email", {"customer_email": {"$type": "string"}})
+    await db.customers.delete_many({"email": {"$nin": emails}})
+    return await db.customers.count_documents({})
+
+
+# Cross-process cache and scheduler leadership
+class SharedCache:
+    """Per-process cache invalidated through version counters stored in Mongo.
+
+    Every worker keeps its own copy of an entry together with the version it
+    was built from. Writers bump the version in `cache_versions`, so any
+    worker reading afterwards sees the mismatch and rebuilds.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self._entries = {}
+
+    async def version(self, key: str) -> int:
+        doc = await self.db.cache_versions.find_one({"_id": key})
+        return doc['version'] if doc else 0
+
+    async def get(self, key: str):
+        version = await self.version(key)
+        entry = self._entries.get(key)
+        if entry and entry[0] == version:
+            return entry[1], version
+        return None, version
+
+    def set(self, key: str, version: int, value):
+        self._entries[key] = (version, value)
+
+    async def invalidate(self, key: str):
+        self._entries.pop(key, None)
+        await self.db.cache_versions.update_one({"_id": key}, {"$inc": {"version": 1}}, upsert=True)
+
+async def acquire_lease(db: AsyncIOMotorDatabase, name: str, worker_id: str) -> bool:
+    """Take or renew the named lease for this worker; False if another worker holds it."""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.leases.find_one_and_update(
+            {"_id": name, "$or": [{"holder": worker_id}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"holder": worker_id, "expires_at": now + timedelta(seconds=LEASE_TTL_SECONDS)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def release_lease(db: AsyncIOMotorDatabase, name: str, worker_id: str):
+    await db.leases.delete_one({"_id": name, "holder": worker_id})
+
+async def claim_job_run(db: AsyncIOMotorDatabase, name: str, interval: int, worker_id: str) -> bool:
+    """Atomically mark a periodic job as run if it is due, so it runs once per interval."""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.scheduled_jobs.find_one_and_update(
+            {"_id": name, "next_run_at": {"$lte": now}},
+            {"$set": {"next_run_at": now + timedelta(seconds=interval), "last_run_at": now, "last_run_by": worker_id}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Read a stored timestamp (ISO string or BSON date) as an aware UTC datetime; None if unreadable."""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+# Open orders are the only ones that need chasing
+OPEN_ORDERS_QUERY = {"is_archived": {"$ne": True}, "stages.delivered": {"$ne": True}}
+
+async def find_due_orders(db: AsyncIOMotorDatabase, now: datetime) -> list:
+    """Open orders that haven't been updated in 5 days, as (order, days_since_update) pairs."""
+    five_days_ago = now - timedelta(days=5)
+    orders = await db.orders.find(OPEN_ORDERS_QUERY, {"_id": 0}).to_list(1000)
+    
+    due = []
+    for order in orders:
+        last_updated = parse_timestamp(order.get('last_updated'))
+        if last_updated is None:
+            logger.warning(f"Skipping order {order.get('id')} with unreadable last_updated {order.get('last_updated')!r}")
+            continue
+        if last_updated < five_days_ago:
+            due.append((order, (now - last_updated).days))
+    
+    return due
+
+async def find_due_reminders(db: AsyncIOMotorDatabase) -> list:
+    due = await find_due_orders(db, datetime.now(timezone.utc))
+    return [
+        {
+            "order_id": order['id'],
+            "customer_name": order.get('customer_name', ''),
+            "days_since_update": days_since_update,
+            "amount": order.get('amount', 0)
+        }
+        for order, days_since_update in due
+    ]
+
+async def send_reminder_digest(state):
+    """Email REMINDER_DIGEST_EMAIL the orders /api/reminders reports as due.
+
+    Each order is included at most once every 5 days; `last_reminder_at` on
+    the order records when it was last sent.
+    """
+    if not (state.resend_api_key and state.reminder_digest_email):
+        return
+    
+    now = datetime.now(timezone.utc)
+    five_days_ago = now - timedelta(days=5)
+    due = []
+    for order, days in await find_due_orders(state.db, now):
+        last_reminder_at = parse_timestamp(order.get('last_reminder_at'))
+        if not (last_reminder_at and last_reminder_at >= five_days_ago):
+            due.append((order, days))
+    
+    if not due:
+        return
+    
+    rows = "".join(
+        f"<tr><td>{html.escape(str(order.get('order_number') or order['id'][:8]))}</td>"
+        f"<td>{html.escape(str(order.get('customer_name', '')))}</td>"
+        f"<td>{days} days</td><td>${html.escape(str(order.get('amount', '')))}</td></tr>"
+        for order, days in due
+    )
+    params = {
+        "from": state.sender_email,
+        "to": [state.reminder_digest_email],
+        "subject": f"{len(due)} orders need a follow-up - Kashmkari",
+        "html": f"<h2>Orders not updated in 5+ days</h2><table>{rows}</table>"
+    }
+    
+    # Run sync SDK in thread to keep the event loop free for requests
+    await asyncio.to_thread(resend.Emails.send, params)
+    await state.db.orders.update_many(
+        {"id": {"$in": [order['id'] for order, _ in due]}},
+        {"$set": {"last_reminder_at": now.isoformat()}}
+    )
+    logger.info(f"Sent reminder digest for {len(due)} orders to {state.reminder_digest_email}")
+
+# Periodic jobs run only by the worker holding the scheduler lease
+PERIODIC_JOBS = {
+    "reminder_digest": (REMINDER_SCAN_INTERVAL, send_reminder_digest),
+}
+
+async def run_scheduler(state):
+    while True:
+        try:
+            if await acquire_lease(state.db, "scheduler", state.worker_id):
+                for name, (interval, job) in PERIODIC_JOBS.items():
+                    if interval > 0 and await claim_job_run(state.db, name, interval, state.worker_id):
+                        await job(state)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Scheduler iteration failed: {str(e)}")
+        await asyncio.sleep(LEASE_RENEW_SECONDS)
+
+
+# Per-app state, set up in create_app()'s startup hook
+def get_state(request: Request):
+    return request.app.state
+
+def get_db(request: Request) -> AsyncIOMotorDatabase:
+    return request.app.state.db
+
+def get_cache(request: Request) -> SharedCache:
+    return request.app.state.cache
+
 
 # Routes
 @api_router.get("/")
@@ -112,7 +400,7 @@ async def root():
     return {"message": "Kashmkari Support Platform API"}
 
 @api_router.post("/orders", response_model=Order)
-async def create_order(input: OrderCreate):
+async def create_order(input: OrderCreate, db: AsyncIOMotorDatabase = Depends(get_db), cache: SharedCache = Depends(get_cache)):
     order_dict = input.model_dump()
     order_obj = Order(**order_dict)
     
@@ -126,50 +414,27 @@ async def create_order(input: OrderCreate):
     doc['last_updated'] = doc['last_updated'].isoformat()
     
     await db.orders.insert_one(doc)
+    
+    # Keep the customer rollup in step with the new order
+    await db.customers.update_one(
+        {"email": doc['customer_email']},
+        {
+            "$set": {"name": doc['customer_name']},
+            "$min": {"first_order_at": doc['created_at']},
+            "$max": {"last_order_at": doc['created_at'], "last_touchpoint": doc['last_updated']},
+            "$inc": {"order_count": 1, "lifetime_value": doc['amount'], "version": 1},
+        },
+        upsert=True
+    )
+    await cache.invalidate("orders")
     return order_obj
 
 @api_router.get("/orders", response_model=List[Order])
-async def get_orders(filter: Optional[str] = None):
-    orders = await db.orders.find({}, {"_id": 0}).to_list(1000)
-    
-    # Convert ISO string timestamps back to datetime objects and handle legacy data
-    for order in orders:
-        if isinstance(order['created_at'], str):
-            order['created_at'] = datetime.fromisoformat(order['created_at'])
-        if isinstance(order['last_updated'], str):
-            order['last_updated'] = datetime.fromisoformat(order['last_updated'])
-        
-        # Handle legacy orders without order_number
-        if 'order_number' not in order or not order['order_number']:
-            order['order_number'] = f"ORD-{order['id'][:8]}"
-        
-        # Handle legacy orders with string product_items instead of list
-        if 'product_items' in order and isinstance(order['product_items'], str):
-            # Convert old string format to new list format
-            order['product_items'] = [{
-                "name": order['product_items'],
-                "quantity": order.get('quantity', 1),
-                "sku": order.get('sku', '')
-            }]
-        
-        # Ensure product_items exists
-        if 'product_items' not in order:
-            order['product_items'] = []
-        
-        # Ensure custom_reminder exists
-        if 'custom_reminder' not in order:
-            order['custom_reminder'] = {"days": 0, "time": "", "note": "", "is_active": False}
-        
-        # Ensure touchpoints.notes exists
-        if 'touchpoints' in order and 'notes' not in order['touchpoints']:
-            order['touchpoints']['notes'] = ""
-        
-        # Ensure is_archived exists
-        if 'is_archived' not in order:
-            order['is_archived'] = False
-    
-    # Sort by created_at descending (newest first)
-    orders.sort(key=lambda x: x['created_at'], reverse=True)
+async def get_orders(filter: Optional[str] = None, db: AsyncIOMotorDatabase = Depends(get_db), cache: SharedCache = Depends(get_cache)):
+    orders, version = await cache.get("orders")
+    if orders is None:
+        orders = await load_orders(db)
+        cache.set("orders", version, orders)
     
     # Apply filters
     if filter == "pending":
@@ -180,47 +445,29 @@ async def get_orders(filter: Optional[str] = None):
     
     return orders
 
+async def load_orders(db: AsyncIOMotorDatabase):
+    orders = await db.orders.find({}, {"_id": 0}).to_list(1000)
+    
+    # Convert ISO string timestamps back to datetime objects and handle legacy data
+    for order in orders:
+        normalize_order(order)
+    
+    # Sort by created_at descending (newest first)
+    orders.sort(key=lambda x: x['created_at'], reverse=True)
+    
+    return orders
+
 @api_router.get("/orders/{order_id}", response_model=Order)
-async def get_order(order_id: str):
+async def get_order(order_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
     order = await db.orders.find_one({"id": order_id}, {"_id": 0})
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    # Convert ISO string timestamps back to datetime objects
-    if isinstance(order['created_at'], str):
-        order['created_at'] = datetime.fromisoformat(order['created_at'])
-    if isinstance(order['last_updated'], str):
-        order['last_updated'] = datetime.fromisoformat(order['last_updated'])
-    
-    # Handle legacy orders without order_number
-    if 'order_number' not in order or not order['order_number']:
-        order['order_number'] = f"ORD-{order['id'][:8]}"
-    
-    # Handle legacy orders with string product_items instead of list
-    if 'product_items' in order and isinstance(order['product_items'], str):
-        order['product_items'] = [{
-            "name": order['product_items'],
-            "quantity": order.get('quantity', 1),
-            "sku": order.get('sku', '')
-        }]
-    
-    # Ensure product_items exists
-    if 'product_items' not in order:
-        order['product_items'] = []
-    
-    # Ensure custom_reminder exists
-    if 'custom_reminder' not in order:
-        order['custom_reminder'] = {"days": 0, "time": "", "note": "", "is_active": False}
-    
-    # Ensure touchpoints.notes exists
-    if 'touchpoints' in order and 'notes' not in order['touchpoints']:
-        order['touchpoints']['notes'] = ""
-    
-    return order
+    return normalize_order(order)
 
 @api_router.put("/orders/{order_id}", response_model=Order)
-async def update_order(order_id: str, update: OrderUpdate):
+async def update_order(order_id: str, update: OrderUpdate, db: AsyncIOMotorDatabase = Depends(get_db), cache: SharedCache = Depends(get_cache)):
     order = await db.orders.find_one({"id": order_id}, {"_id": 0})
     
     if not order:
@@ -245,45 +492,28 @@ async def update_order(order_id: str, update: OrderUpdate):
         update_data['is_high_priority'] = order['amount'] > 500 or touchpoint_count > 3
     
     await db.orders.update_one({"id": order_id}, {"$set": update_data})
+    await db.customers.update_one(
+        {"email": order['customer_email']},
+        {"$max": {"last_touchpoint": update_data['last_updated']}, "$inc": {"version": 1}}
+    )
+    await cache.invalidate("orders")
     
     # Fetch updated order
     updated_order = await db.orders.find_one({"id": order_id}, {"_id": 0})
     
-    # Convert ISO string timestamps back to datetime objects
-    if isinstance(updated_order['created_at'], str):
-        updated_order['created_at'] = datetime.fromisoformat(updated_order['created_at'])
-    if isinstance(updated_order['last_updated'], str):
-        updated_order['last_updated'] = datetime.fromisoformat(updated_order['last_updated'])
-    
-    return updated_order
+    return normalize_order(updated_order)
 
 @api_router.get("/reminders", response_model=List[ReminderResponse])
-async def get_reminders():
-    # Get orders that haven't been updated in 5 days
-    five_days_ago = datetime.now(timezone.utc) - timedelta(days=5)
-    orders = await db.orders.find({}, {"_id": 0}).to_list(1000)
-    
-    reminders = []
-    for order in orders:
-        last_updated = datetime.fromisoformat(order['last_updated'])
-        if last_updated < five_days_ago:
-            days_since_update = (datetime.now(timezone.utc) - last_updated).days
-            reminders.append({
-                "order_id": order['id'],
-                "customer_name": order['customer_name'],
-                "days_since_update": days_since_update,
-                "amount": order['amount']
-            })
-    
-    return reminders
+async def get_reminders(db: AsyncIOMotorDatabase = Depends(get_db)):
+    return await find_due_reminders(db)
 
 @api_router.post("/send-email")
-async def send_email(request: EmailRequest):
-    if not resend.api_key:
+async def send_email(request: EmailRequest, state=Depends(get_state)):
+    if not state.resend_api_key:
         raise HTTPException(status_code=500, detail="Resend API key not configured")
     
     params = {
-        "from": SENDER_EMAIL,
+        "from": state.sender_email,
         "to": [request.recipient_email],
         "subject": request.subject,
         "html": request.html_content
@@ -303,35 +533,60 @@ async def send_email(request: EmailRequest):
 
 
 @api_router.put("/orders/{order_id}/archive")
-async def archive_order(order_id: str):
-    result = await db.orders.update_one(
+async def archive_order(order_id: str, db: AsyncIOMotorDatabase = Depends(get_db), cache: SharedCache = Depends(get_cache)):
+    last_updated = datetime.now(timezone.utc).isoformat()
+    order = await db.orders.find_one_and_update(
         {"id": order_id},
-        {"$set": {"is_archived": True, "last_updated": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"is_archived": True, "last_updated": last_updated}},
+        projection={"_id": 0, "customer_email": 1}
     )
     
-    if result.matched_count == 0:
+    if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    if order.get('customer_email'):
+        await db.customers.update_one(
+            {"email": order['customer_email']},
+            {"$max": {"last_touchpoint": last_updated}, "$inc": {"version": 1}}
+        )
+    await cache.invalidate("orders")
+    
     return {"message": "Order archived successfully", "order_id": order_id}
 
 @api_router.put("/orders/{order_id}/unarchive")
-async def unarchive_order(order_id: str):
-    result = await db.orders.update_one(
+async def unarchive_order(order_id: str, db: AsyncIOMotorDatabase = Depends(get_db), cache: SharedCache = Depends(get_cache)):
+    last_updated = datetime.now(timezone.utc).isoformat()
+    order = await db.orders.find_one_and_update(
         {"id": order_id},
-        {"$set": {"is_archived": False, "last_updated": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"is_archived": False, "last_updated": last_updated}},
+        projection={"_id": 0, "customer_email": 1}
     )
     
-    if result.matched_count == 0:
+    if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    if order.get('customer_email'):
+        await db.customers.update_one(
+            {"email": order['customer_email']},
+            {"$max": {"last_touchpoint": last_updated}, "$inc": {"version": 1}}
+        )
+    await cache.invalidate("orders")
+    
     return {"message": "Order unarchived successfully", "order_id": order_id}
 
 @api_router.post("/orders/bulk-archive")
-async def bulk_archive_orders(order_ids: List[str]):
+async def bulk_archive_orders(order_ids: List[str], db: AsyncIOMotorDatabase = Depends(get_db), cache: SharedCache = Depends(get_cache)):
+    last_updated = datetime.now(timezone.utc).isoformat()
+    emails = await db.orders.distinct("customer_email", {"id": {"$in": order_ids}})
     result = await db.orders.update_many(
         {"id": {"$in": order_ids}},
-        {"$set": {"is_archived": True, "last_updated": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"is_archived": True, "last_updated": last_updated}}
+    )
+    await db.customers.update_many(
+        {"email": {"$in": emails}},
+        {"$max": {"last_touchpoint": last_updated}, "$inc": {"version": 1}}
     )
+    await cache.invalidate("orders")
     
     return {
         "message": f"{result.modified_count} orders archived successfully",
@@ -339,34 +594,62 @@ async def bulk_archive_orders(order_ids: List[str]):
     }
 
 @api_router.delete("/orders/{order_id}")
-async def delete_order(order_id: str):
+async def delete_order(order_id: str, db: AsyncIOMotorDatabase = Depends(get_db), cache: SharedCache = Depends(get_cache)):
+    order = await db.orders.find_one({"id": order_id}, {"_id": 0, "customer_email": 1})
     result = await db.orders.delete_one({"id": order_id})
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    if order.get('customer_email'):
+        await refresh_customer(db, order['customer_email'])
+    await cache.invalidate("orders")
+    
     return {"message": "Order deleted successfully", "order_id": order_id}
 
 @api_router.post("/orders/bulk-delete")
-async def bulk_delete_orders(order_ids: List[str]):
+async def bulk_delete_orders(order_ids: List[str], db: AsyncIOMotorDatabase = Depends(get_db), cache: SharedCache = Depends(get_cache)):
+    emails = await db.orders.distinct("customer_email", {"id": {"$in": order_ids}})
     result = await db.orders.delete_many({"id": {"$in": order_ids}})
     
+    for email in emails:
+        await refresh_customer(db, email)
+    await cache.invalidate("orders")
+    
     return {
         "message": f"{result.deleted_count} orders deleted successfully",
         "deleted_count": result.deleted_count
     }
 
+@api_router.get("/customers", response_model=List[Customer])
+async def get_customers(sort: Literal["recent", "value"] = "recent", limit: int = 100, skip: int = 0, db: AsyncIOMotorDatabase = Depends(get_db)):
+    sort_field = "lifetime_value" if sort == "value" else "last_touchpoint"
+    limit = max(1, min(limit, 1000))
+    customers = await db.customers.find({}, {"_id": 0}).sort(sort_field, -1).skip(max(skip, 0)).to_list(limit)
+    return customers
 
-# Include the router in the main app
-app.include_router(api_router)
+@api_router.post("/customers/rebuild")
+async def rebuild_customer_rollups(db: AsyncIOMotorDatabase = Depends(get_db)):
+    customer_count = await rebuild_customers(db)
+    
+    return {
+        "message": f"Rebuilt rollups for {customer_count} customers",
+        "customer_count": customer_count
+    }
+
+@api_router.get("/customers/{email}", response_model=CustomerDetail)
+async def get_customer(email: str, db: AsyncIOMotorDatabase = Depends(get_db)):
+    customer = await db.customers.find_one({"email": email}, {"_id": 0})
+    
+    if not customer:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    
+    # Oldest first so the order list reads as a timeline
+    orders = await db.orders.find({"customer_email": email}, {"_id": 0}).sort("created_at", 1).to_list(1000)
+    customer['orders'] = [normalize_order(order) for order in orders]
+    
+    return customer
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
 # Configure logging
 logging.basicConfig(
@@ -375,6 +658,89 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+async def create_indexes(db: AsyncIOMotorDatabase):
+    await db.orders.create_index("id")
+    await db.orders.create_index([("customer_email", 1), ("created_at", 1)])
+    await db.customers.create_index("email", unique=True)
+    await db.customers.create_index([("last_touchpoint", -1)])
+    await db.customers.create_index([("lifetime_value", -1)])
+    
+    # Backfill rollups for orders created before the customers collection existed
+    if await db.customers.estimated_document_count() == 0:
+        await rebuild_customers(db)
+
+def create_app() -> FastAPI:
+    """Build the API application.
+
+    Configuration is read here, but the Mongo client, cache and worker id are
+    created in the startup hook and kept on `app.state`, so every worker
+    process (including ones forked after import, e.g. gunicorn --preload)
+    gets its own:
+
+        uvicorn server:create_app --factory --workers 4
+        gunicorn -k uvicorn.workers.UvicornWorker -w 4 'server:create_app()'
+
+    Workers share cache invalidation through Mongo and only the holder of the
+    scheduler lease runs periodic jobs.
+    """
+    # Create the main app without a prefix
+    app = FastAPI()
+    
+    app.state.mongo_url = os.environ['MONGO_URL']
+    app.state.db_name = os.environ['DB_NAME']
+    app.state.resend_api_key = os.environ.get('RESEND_API_KEY', '')
+    app.state.sender_email = os.environ.get('SENDER_EMAIL', 'onboarding@resend.dev')
+    app.state.reminder_digest_email = os.environ.get('REMINDER_DIGEST_EMAIL', '')
+    app.state.client = None
+    app.state.scheduler_task = None
+    
+    # Include the router in the main app
+    app.include_router(api_router)
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    @app.on_event("startup")
+    async def startup():
+        state = app.state
+        state.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        state.client = AsyncIOMotorClient(state.mongo_url)
+        state.db = state.client[state.db_name]
+        state.cache = SharedCache(state.db)
+        
+        # The Resend SDK only supports a process-wide key
+        resend.api_key = state.resend_api_key
+        
+        await create_indexes(state.db)
+        state.scheduler_task = asyncio.create_task(run_scheduler(state))
+        logger.info(f"Worker {state.worker_id} started")
+    
+    @app.on_event("shutdown")
+    async def shutdown_db_client():
+        state = app.state
+        if state.scheduler_task:
+            state.scheduler_task.cancel()
+            await asyncio.gather(state.scheduler_task, return_exceptions=True)
+        if state.client is not None:
+            await release_lease(state.db, "scheduler", state.worker_id)
+            state.client.close()
+    
+    return app
+
+app = create_app()
+
+if __name__ == "__main__":
+    import uvicorn
+    
+    uvicorn.run(
+        "server:create_app",
+        factory=True,
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', '8001')),
+        workers=int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1)),
+    )
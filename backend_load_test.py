@@ -0,0 +1,451 @@
+"""Load and soak testing for the Kashmkari API.
+
+Drives N concurrent virtual agents against a local server with a weighted
+mix of create/list/detail/update/archive/reminder/email/customer calls and reports
+throughput, error rate and tail latency.
+
+    # against an already running server
+    python backend_load_test.py --users 20 --duration 60
+
+    # spawn uvicorn against local Mongo with a stubbed Resend endpoint
+    python backend_load_test.py --spawn --steps 1,5,10,20,40 --duration 30
+
+    # compare throughput across worker counts
+    python backend_load_test.py --spawn --workers 1,2,4 --steps 10,40 --duration 30
+
+Requires httpx (and uvicorn + the backend requirements when using --spawn).
+Spawned runs use a throwaway database that is dropped afterwards unless
+--keep-db is given. A database named with --db-name is never dropped unless
+--drop-db is passed, and must be empty otherwise. Without --spawn the run
+writes LOAD-* orders into the target server's database, and send-email
+calls are skipped unless --allow-real-email is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+
+DEFAULT_MIX = "create=2,list=3,detail=4,update=3,archive=1,reminders=1,email=1,customer=2"
+
+
+class StubResend:
+    """Minimal HTTP server that accepts Resend email sends without delivering them."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.sent = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return f"http://{self.host}:{self.port}"
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                content_length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        content_length = int(value.strip())
+                if content_length:
+                    await reader.readexactly(content_length)
+
+                self.sent += 1
+                body = json.dumps({"id": str(uuid.uuid4())}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class LoadTester:
+    def __init__(self, base_url, mix, think_time=0.0, timeout=30.0):
+        self.base_url = base_url
+        self.api_url = f"{base_url}/api"
+        self.mix = mix
+        self.think_time = think_time
+        self.timeout = timeout
+        self.order_ids = []
+        self.customer_emails = set()
+
+    def order_payload(self):
+        """Build a random but valid order creation body"""
+        customer = random.randint(1, 200)
+        return {
+            "order_number": f"LOAD-{uuid.uuid4().hex[:10]}",
+            "order_date": time.strftime("%Y-%m-%d"),
+            "customer_name": f"Load Customer {customer}",
+            "customer_email": f"load.customer{customer}@example.com",
+            "product_items": [
+                {"name": "Hand Embroidered Shawl", "quantity": random.randint(1, 3), "sku": "SHWL-001"}
+            ],
+            "amount": round(random.uniform(50, 900), 2),
+            "notes": "load test order"
+        }
+
+    def pick_order(self):
+        return random.choice(self.order_ids) if self.order_ids else None
+
+    async def run_op(self, client, op):
+        """Issue one request for the given operation and return its response"""
+        if op == "create":
+            payload = self.order_payload()
+            response = await client.post("/orders", json=payload)
+            if response.status_code == 200:
+                self.order_ids.append(response.json()["id"])
+                self.customer_emails.add(payload["customer_email"])
+            return response
+        if op == "list":
+            return await client.get("/orders", params=random.choice([{}, {"filter": "pending"}, {"filter": "high_priority"}]))
+        if op == "reminders":
+            return await client.get("/reminders")
+        if op == "email":
+            return await client.post("/send-email", json={
+                "recipient_email": "load.recipient@example.com",
+                "subject": "Order Update - Kashmkari",
+                "html_content": "<p>Your order is being processed.</p>"
+            })
+
+        order_id = self.pick_order()
+        if order_id is None:
+            return await self.run_op(client, "create")
+        if op == "customer":
+            # Deletes aren't in the mix, so every customer created so far still exists
+            return await client.get(f"/customers/{random.choice(sorted(self.customer_emails))}")
+        if op == "detail":
+            return await client.get(f"/orders/{order_id}")
+        if op == "update":
+            return await client.put(f"/orders/{order_id}", json={
+                "touchpoints": {
+                    "whatsapp": random.random() < 0.5,
+                    "email": random.random() < 0.5,
+                    "crisp": random.random() < 0.5
+                }
+            })
+        if op == "archive":
+            return await client.put(f"/orders/{order_id}/archive")
+        raise ValueError(f"Unknown operation: {op}")
+
+    async def virtual_user(self, client, start_delay, end_time, samples):
+        await asyncio.sleep(start_delay)
+        ops, weights = zip(*self.mix.items())
+        while time.perf_counter() < end_time:
+            op = random.choices(ops, weights)[0]
+            started = time.perf_counter()
+            try:
+                response = await self.run_op(client, op)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            samples.append((op, time.perf_counter() - started, ok, started))
+            if self.think_time:
+                await asyncio.sleep(random.uniform(0, 2 * self.think_time))
+
+    async def seed(self, client, count=20):
+        """Create a few orders so detail/update/archive have targets from the start"""
+        for _ in range(count):
+            await self.run_op(client, "create")
+
+    async def run_stage(self, users, duration, ramp_up, report_interval=0):
+        """Run one stage of `users` concurrent agents and return the collected samples"""
+        samples = []
+        limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+        async with httpx.AsyncClient(base_url=self.api_url, timeout=self.timeout, limits=limits) as client:
+            if not self.order_ids:
+                await self.seed(client)
+
+            started = time.perf_counter()
+            end_time = started + ramp_up + duration
+            tasks = [
+                asyncio.create_task(self.virtual_user(client, ramp_up * i / users, end_time, samples))
+                for i in range(users)
+            ]
+            reporter = None
+            if report_interval:
+                reporter = asyncio.create_task(self.report_progress(samples, started, report_interval))
+            await asyncio.gather(*tasks)
+            finished = time.perf_counter()
+            if reporter:
+                reporter.cancel()
+
+        # Exclude the ramp-up window so stage numbers reflect full concurrency.
+        # Requests still in flight at end_time are counted, so measure up to
+        # when the last one actually finished rather than assuming `duration`.
+        steady_start = started + ramp_up
+        steady = [s for s in samples if s[3] >= steady_start]
+        if steady:
+            return steady, finished - steady_start
+        return samples, finished - started
+
+    async def report_progress(self, samples, started, interval):
+        seen = 0
+        while True:
+            await asyncio.sleep(interval)
+            window = samples[seen:]
+            seen = len(samples)
+            errors = sum(1 for s in window if not s[2])
+            p95 = percentile(sorted(s[1] for s in window), 95)
+            print(f"   ⏱  t={time.perf_counter() - started:6.1f}s  {len(window) / interval:8.1f} req/s  "
+                  f"errors={errors}  p95={p95 * 1000:.1f}ms")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    """Return per-operation and overall throughput/error/latency figures"""
+    by_op = defaultdict(list)
+    for op, latency, ok, _ in samples:
+        by_op[op].append((latency, ok))
+        by_op["TOTAL"].append((latency, ok))
+
+    rows = {}
+    for op, values in by_op.items():
+        latencies = sorted(v[0] for v in values)
+        errors = sum(1 for v in values if not v[1])
+        rows[op] = {
+            "requests": len(values),
+            "throughput": len(values) / elapsed if elapsed else 0.0,
+            "error_rate": errors / len(values),
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": latencies[-1] * 1000,
+        }
+    return rows
+
+
+def print_summary(users, rows):
+    print(f"\n📊 {users} virtual users")
+    print(f"   {'operation':<10} {'requests':>9} {'req/s':>9} {'errors':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for op in sorted(rows, key=lambda k: (k == "TOTAL", k)):
+        r = rows[op]
+        print(f"   {op:<10} {r['requests']:>9} {r['throughput']:>9.1f} {r['error_rate']:>7.1%} "
+              f"{r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms {r['max_ms']:>7.1f}ms")
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        op, _, weight = part.partition("=")
+        mix[op.strip()] = float(weight or 1)
+    unknown = set(mix) - {"create", "list", "detail", "update", "archive", "reminders", "email", "customer"}
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+    return {op: w for op, w in mix.items() if w > 0}
+
+
+def spawn_server(port, resend_url, workers, mongo_url, db_name):
+    """Start uvicorn for the backend against local Mongo and the Resend stub"""
+    env = dict(os.environ)
+    env.update({
+        "MONGO_URL": mongo_url,
+        "DB_NAME": db_name,
+        "RESEND_API_KEY": "re_load_test_stub",
+        "RESEND_API_URL": resend_url,
+    })
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:create_app", "--factory", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+def drop_database(mongo_url, db_name):
+    """Remove a spawned run's database so runs start from the same empty state"""
+    from pymongo import MongoClient
+
+    with MongoClient(mongo_url, serverSelectionTimeoutMS=5000) as client:
+        client.drop_database(db_name)
+
+
+def database_is_empty(mongo_url, db_name):
+    from pymongo import MongoClient
+
+    with MongoClient(mongo_url, serverSelectionTimeoutMS=5000) as client:
+        return not client[db_name].list_collection_names()
+
+
+async def wait_for_server(base_url, timeout=30):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get(f"{base_url}/api/")).status_code == 200:
+                    return True
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    return False
+
+
+async def run_steps(base_url, mix, args):
+    """Run every --steps stage against one server and return (users, totals) pairs"""
+    tester = LoadTester(base_url, mix, think_time=args.think_time, timeout=args.timeout)
+    steps = [int(s) for s in args.steps.split(",")] if args.steps else [args.users]
+
+    results = []
+    for users in steps:
+        print(f"\n🚀 Ramping to {users} virtual users over {args.ramp_up}s, holding for {args.duration}s")
+        samples, elapsed = await tester.run_stage(users, args.duration, args.ramp_up, args.report_interval)
+        rows = summarize(samples, elapsed)
+        print_summary(users, rows)
+        results.append((users, rows.get("TOTAL")))
+
+    if len(results) > 1:
+        print("\n📈 Saturation curve")
+        print(f"   {'users':>6} {'req/s':>9} {'errors':>8} {'p99':>9}")
+        for users, total in results:
+            if total:
+                print(f"   {users:>6} {total['throughput']:>9.1f} {total['error_rate']:>7.1%} {total['p99_ms']:>7.1f}ms")
+    return results
+
+
+async def run_spawned(args, mix, workers):
+    """Start a server with `workers` processes and load it"""
+    # Only databases this script named itself are dropped without asking
+    generated = args.db_name is None
+    db_name = args.db_name or f"kashmkari_load_test_{uuid.uuid4().hex[:8]}"
+    drop_after = (generated or args.drop_db) and not args.keep_db
+    stub = None
+    server = None
+    try:
+        if not generated:
+            if args.drop_db:
+                drop_database(args.mongo_url, db_name)
+            elif not database_is_empty(args.mongo_url, db_name):
+                print(f"❌ Database {db_name} already contains data. Pass --drop-db to erase it first, "
+                      f"or leave out --db-name to use a throwaway database.")
+                return None
+        print(f"\n🗄  {workers} worker(s), database {db_name}")
+        stub = StubResend()
+        resend_url = await stub.start()
+        print(f"📭 Resend stub listening on {resend_url}")
+        server = spawn_server(args.port, resend_url, workers, args.mongo_url, db_name)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+        if not await wait_for_server(base_url):
+            print(f"❌ API at {base_url} is not responding. Stopping load test.")
+            return None
+
+        results = await run_steps(base_url, mix, args)
+        print(f"\n📧 Resend stub accepted {stub.sent} emails")
+        return results
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+        if stub:
+            await stub.stop()
+        if drop_after:
+            drop_database(args.mongo_url, db_name)
+
+
+async def run(args):
+    mix = parse_mix(args.mix)
+    runs = []
+    if args.spawn:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            results = await run_spawned(args, mix, workers)
+            if results is None:
+                return 1
+            runs.append((workers, results))
+    else:
+        # Without --spawn the target server sends through its own Resend key
+        if "email" in mix and not args.allow_real_email:
+            del mix["email"]
+            print("⚠️  Skipping send-email calls: the target server would send real emails. "
+                  "Use --spawn for a stubbed Resend or pass --allow-real-email.")
+        if not mix:
+            print("❌ No operations left in --mix. Stopping load test.")
+            return 1
+        print(f"⚠️  This run creates LOAD-* orders (and archives some orders) in the database behind {args.base_url}.")
+        if not await wait_for_server(args.base_url):
+            print(f"❌ API at {args.base_url} is not responding. Stopping load test.")
+            return 1
+        runs.append((None, await run_steps(args.base_url, mix, args)))
+
+    if len(runs) > 1:
+        print("\n🧮 Worker scaling (peak throughput across stages)")
+        print(f"   {'workers':>7} {'req/s':>9} {'speedup':>8}")
+        baseline = None
+        for workers, results in runs:
+            peak = max((total['throughput'] for _, total in results if total), default=0.0)
+            baseline = baseline or peak
+            print(f"   {workers:>7} {peak:>9.1f} {peak / baseline if baseline else 0:>7.2f}x")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps([
+            {"workers": workers, "users": users, "total": total}
+            for workers, results in runs for users, total in results
+        ], indent=2))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load and soak test the Kashmkari API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8001", help="server to target when not using --spawn")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--steps", help="comma separated user counts to run in sequence, e.g. 1,5,10,20,40")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to hold each stage at full concurrency")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds to spread virtual user start-up over")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted operation mix")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between a user's requests")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--report-interval", type=float, default=0, help="print progress every N seconds (soak runs)")
+    parser.add_argument("--json", help="write the per-stage totals to this file")
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn locally with a stubbed Resend")
+    parser.add_argument("--port", type=int, default=8011, help="port for the spawned server")
+    parser.add_argument("--workers", default="1", help="uvicorn workers for the spawned server; a comma separated list runs each in turn")
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017", help="Mongo for the spawned server")
+    parser.add_argument("--db-name", help="database for the spawned server (default: a throwaway per-run database); "
+                                          "a named database must be empty unless --drop-db is given")
+    parser.add_argument("--drop-db", action="store_true",
+                        help="ERASE the --db-name database before the run (and after it, unless --keep-db)")
+    parser.add_argument("--keep-db", action="store_true", help="keep the spawned server's database after the run")
+    parser.add_argument("--allow-real-email", action="store_true",
+                        help="keep send-email calls in the mix without --spawn; the target server sends real emails")
+    args = parser.parse_args()
+
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -28,6 +28,8 @@ class KashmkariAPITester:
                 response = requests.post(url, json=data, headers=headers)
             elif method == 'PUT':
                 response = requests.put(url, json=data, headers=headers)
+            elif method == 'DELETE':
+                response = requests.delete(url, headers=headers)
 
             success = response.status_code == expected_status
             if success:
@@ -267,6 +269,171 @@ class KashmkariAPITester:
         )
         return success
 
+    def create_customer_order(self, email, amount):
+        """Create an order for the given customer email"""
+        order_data = {
+            "order_number": f"ROLLUP-{uuid.uuid4().hex[:8]}",
+            "order_date": "2024-01-15",
+            "customer_name": "Rollup Test Customer",
+            "customer_email": email,
+            "product_items": [{"name": "Pashmina Stole", "quantity": 1, "sku": "STOL-001"}],
+            "amount": amount,
+            "notes": "Customer rollup test"
+        }
+        
+        success, response = self.run_test(
+            f"Create Order for {email} (${amount})",
+            "POST",
+            "/orders",
+            200,
+            data=order_data
+        )
+        
+        if success and 'id' in response:
+            return response['id']
+        return None
+
+    def test_customer_rollup(self):
+        """Test customer rollup across create, update and delete"""
+        email = f"rollup.{uuid.uuid4().hex[:8]}@example.com"
+        first_id = self.create_customer_order(email, 120.0)
+        time.sleep(0.1)
+        second_id = self.create_customer_order(email, 80.5)
+        if not first_id or not second_id:
+            return False
+        
+        success, customer = self.run_test(
+            "Get Customer Rollup",
+            "GET",
+            f"/customers/{email}",
+            200
+        )
+        if not success:
+            return False
+        
+        checks = [
+            (customer.get('order_count') == 2, f"order_count is 2 (got {customer.get('order_count')})"),
+            (abs(customer.get('lifetime_value', 0) - 200.5) < 0.01, f"lifetime_value is 200.5 (got {customer.get('lifetime_value')})"),
+            ([o['id'] for o in customer.get('orders', [])] == [first_id, second_id], "orders are listed oldest first"),
+        ]
+        
+        # Updating an order should move the customer's last touchpoint forward
+        touchpoint_before = customer.get('last_touchpoint')
+        time.sleep(0.1)
+        self.run_test(
+            "Update Customer Order",
+            "PUT",
+            f"/orders/{first_id}",
+            200,
+            data={"notes": "Followed up on WhatsApp"}
+        )
+        success, customer = self.run_test(
+            "Get Customer After Update",
+            "GET",
+            f"/customers/{email}",
+            200
+        )
+        touchpoint_after = customer.get('last_touchpoint')
+        checks.append((
+            bool(touchpoint_before and touchpoint_after)
+            and datetime.fromisoformat(touchpoint_after.replace('Z', '+00:00')) > datetime.fromisoformat(touchpoint_before.replace('Z', '+00:00')),
+            "last_touchpoint moves forward after an update"
+        ))
+        
+        # Deleting an order should recompute the rollup from the remaining orders
+        self.run_test(
+            "Delete Customer Order",
+            "DELETE",
+            f"/orders/{first_id}",
+            200
+        )
+        success, customer = self.run_test(
+            "Get Customer After Delete",
+            "GET",
+            f"/customers/{email}",
+            200
+        )
+        checks.append((
+            customer.get('order_count') == 1 and abs(customer.get('lifetime_value', 0) - 80.5) < 0.01,
+            "delete recomputes order_count and lifetime_value"
+        ))
+        
+        self.measure_customer_lookup(email)
+        
+        # Removing the last order removes the customer
+        self.run_test(
+            "Delete Last Customer Order",
+            "DELETE",
+            f"/orders/{second_id}",
+            200
+        )
+        gone, _ = self.run_test(
+            "Get Customer With No Orders",
+            "GET",
+            f"/customers/{email}",
+            404
+        )
+        checks.append((gone, "customer is removed once their last order is deleted"))
+        
+        all_passed = True
+        for passed, description in checks:
+            print(f"   {'✅' if passed else '❌'} {description}")
+            all_passed = all_passed and passed
+        
+        self.tests_run += 1
+        if all_passed:
+            self.tests_passed += 1
+        return all_passed
+
+    def measure_customer_lookup(self, email, samples=20):
+        """Report round-trip latency of customer lookups (includes network time)"""
+        latencies = []
+        for _ in range(samples):
+            started = time.perf_counter()
+            requests.get(f"{self.api_url}/customers/{email}")
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        print(f"   ⏱  Customer lookup p50={latencies[len(latencies) // 2]:.1f}ms max={latencies[-1]:.1f}ms over {samples} requests")
+
+    def test_customer_not_found(self):
+        """Test getting a customer with no orders"""
+        success, response = self.run_test(
+            "Get Unknown Customer",
+            "GET",
+            f"/customers/nobody.{uuid.uuid4().hex[:8]}@example.com",
+            404
+        )
+        return success
+
+    def test_list_customers(self):
+        """Test listing customers"""
+        success, response = self.run_test(
+            "List Customers",
+            "GET",
+            "/customers",
+            200,
+            params={"sort": "value", "limit": 10}
+        )
+        
+        if success:
+            values = [c.get('lifetime_value', 0) for c in response]
+            if values == sorted(values, reverse=True):
+                print(f"   ✅ {len(values)} customers sorted by lifetime value")
+            else:
+                print(f"   ❌ Customers not sorted by lifetime value")
+                self.tests_passed -= 1
+                success = False
+        
+        # An unknown sort key is rejected rather than silently ignored
+        invalid_sort_rejected, _ = self.run_test(
+            "List Customers With Unknown Sort",
+            "GET",
+            "/customers",
+            422,
+            params={"sort": "bogus"}
+        )
+        return success and invalid_sort_rejected
+
 def main():
     print("🚀 Starting Kashmkari Customer Support Platform API Tests")
     print("=" * 60)
@@ -309,6 +476,11 @@ def main():
     tester.test_order_not_found()
     tester.test_invalid_order_creation()
     
+    # Test 10: Customer rollups
+    tester.test_customer_rollup()
+    tester.test_customer_not_found()
+    tester.test_list_customers()
+    
     # Print final results
     print("\n" + "=" * 60)
     print(f"📊 Final Results: {tester.tests_passed}/{tester.tests_run} tests passed")
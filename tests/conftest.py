@@ -0,0 +1,50 @@
+"""Shared setup for tests that need a live MongoDB.
+
+Set TEST_MONGO_URL (or MONGO_URL) to a reachable server; tests marked with
+`requires_mongo` are skipped otherwise. Each test works in its own
+throwaway database.
+"""
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+MONGO_URL = os.environ.get("TEST_MONGO_URL") or os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_URL", MONGO_URL)
+os.environ.setdefault("DB_NAME", "kashmkari_test")
+
+
+def mongo_available():
+    try:
+        with MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000) as client:
+            client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+
+
+requires_mongo = pytest.mark.skipif(not mongo_available(), reason=f"MongoDB not reachable at {MONGO_URL}")
+
+
+@pytest.fixture
+def run_with_db():
+    """Run an async test body against a fresh database and drop it afterwards"""
+    def run(test):
+        async def runner():
+            client = AsyncIOMotorClient(MONGO_URL)
+            db_name = f"kashmkari_test_{uuid.uuid4().hex[:8]}"
+            try:
+                await test(client[db_name])
+            finally:
+                await client.drop_database(db_name)
+                client.close()
+        asyncio.run(runner())
+    return run
@@ -0,0 +1,86 @@
+"""Multi-worker coordination checks against a live MongoDB."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+from tests.conftest import requires_mongo
+
+pytestmark = requires_mongo
+
+
+def test_lease_is_exclusive_until_it_expires(run_with_db):
+    async def body(db):
+        assert await server.acquire_lease(db, "scheduler", "worker-a")
+        assert not await server.acquire_lease(db, "scheduler", "worker-b")
+        # The holder can renew its own lease
+        assert await server.acquire_lease(db, "scheduler", "worker-a")
+        assert not await server.acquire_lease(db, "scheduler", "worker-b")
+
+        await db.leases.update_one(
+            {"_id": "scheduler"},
+            {"$set": {"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+        )
+        assert await server.acquire_lease(db, "scheduler", "worker-b")
+        assert not await server.acquire_lease(db, "scheduler", "worker-a")
+
+    run_with_db(body)
+
+
+def test_released_lease_can_be_taken_over(run_with_db):
+    async def body(db):
+        assert await server.acquire_lease(db, "scheduler", "worker-a")
+        # Releasing someone else's lease is a no-op
+        await server.release_lease(db, "scheduler", "worker-b")
+        assert not await server.acquire_lease(db, "scheduler", "worker-b")
+
+        await server.release_lease(db, "scheduler", "worker-a")
+        assert await server.acquire_lease(db, "scheduler", "worker-b")
+
+    run_with_db(body)
+
+
+def test_concurrent_lease_attempts_elect_one_worker(run_with_db):
+    async def body(db):
+        results = await asyncio.gather(*[
+            server.acquire_lease(db, "scheduler", f"worker-{i}") for i in range(8)
+        ])
+        assert sum(results) == 1
+
+    run_with_db(body)
+
+
+def test_job_is_claimed_once_per_interval(run_with_db):
+    async def body(db):
+        assert await server.claim_job_run(db, "reminder_digest", 60, "worker-a")
+        assert not await server.claim_job_run(db, "reminder_digest", 60, "worker-b")
+        assert not await server.claim_job_run(db, "reminder_digest", 60, "worker-a")
+
+        # Once the interval has passed the next run can be claimed again
+        await db.scheduled_jobs.update_one(
+            {"_id": "reminder_digest"},
+            {"$set": {"next_run_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+        )
+        results = await asyncio.gather(*[
+            server.claim_job_run(db, "reminder_digest", 60, f"worker-{i}") for i in range(8)
+        ])
+        assert sum(results) == 1
+
+    run_with_db(body)
+
+
+def test_shared_cache_invalidation_reaches_other_workers(run_with_db):
+    async def body(db):
+        worker_a = server.SharedCache(db)
+        worker_b = server.SharedCache(db)
+
+        value, version = await worker_a.get("orders")
+        assert value is None
+        worker_a.set("orders", version, ["cached"])
+        assert (await worker_a.get("orders"))[0] == ["cached"]
+
+        await worker_b.invalidate("orders")
+        value, new_version = await worker_a.get("orders")
+        assert value is None
+        assert new_version == version + 1
+
+    run_with_db(body)
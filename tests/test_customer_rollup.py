@@ -0,0 +1,83 @@
+"""Customer rollup maintenance checks against a live MongoDB."""
+from datetime import datetime, timezone
+
+from pymongo import MongoClient
+
+import server
+from tests.conftest import MONGO_URL, requires_mongo
+
+pytestmark = requires_mongo
+
+
+def make_order(order_id, email, amount):
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        "id": order_id,
+        "order_number": f"ORD-{order_id}",
+        "order_date": "2024-01-15",
+        "customer_name": "Rollup Customer",
+        "customer_email": email,
+        "product_items": [],
+        "amount": amount,
+        "created_at": now,
+        "last_updated": now,
+    }
+
+
+def test_refresh_retries_when_a_create_lands_mid_recompute(run_with_db, monkeypatch):
+    async def body(db):
+        await server.create_indexes(db)
+        email = "race@example.com"
+        await db.orders.insert_many([make_order("a", email, 100), make_order("b", email, 50)])
+        await server.refresh_customer(db, email)
+        await db.orders.delete_one({"id": "a"})
+
+        original = server.customer_rollup_pipeline
+        calls = []
+
+        def pipeline_racing_a_create(match=None):
+            calls.append(match)
+            if len(calls) > 1:
+                return original(match)
+            # Another worker's create_order lands after this recompute has
+            # read the orders but before it stores the result
+            with MongoClient(MONGO_URL) as sync_client:
+                sync_db = sync_client[db.name]
+                sync_db.orders.insert_one(make_order("c", email, 25))
+                sync_db.customers.update_one(
+                    {"email": email},
+                    {"$inc": {"order_count": 1, "lifetime_value": 25, "version": 1}}
+                )
+            return original({**(match or {}), "id": {"$ne": "c"}})
+
+        monkeypatch.setattr(server, "customer_rollup_pipeline", pipeline_racing_a_create)
+        await server.refresh_customer(db, email)
+
+        customer = await db.customers.find_one({"email": email})
+        assert len(calls) == 2
+        assert customer["order_count"] == 2
+        assert customer["lifetime_value"] == 75
+
+    run_with_db(body)
+
+
+def test_rebuild_repairs_drifted_and_orphaned_customers(run_with_db):
+    async def body(db):
+        await server.create_indexes(db)
+        await db.orders.insert_many([
+            make_order("a", "kept@example.com", 40),
+            make_order("b", "kept@example.com", "60"),
+            {**make_order("c", "ignored@example.com", 10), "customer_email": None},
+        ])
+        await db.customers.insert_many([
+            {"email": "kept@example.com", "name": "Kept", "order_count": 9, "lifetime_value": 1.0},
+            {"email": "gone@example.com", "name": "Gone", "order_count": 1, "lifetime_value": 5.0},
+        ])
+
+        assert await server.rebuild_customers(db) == 1
+        customer = await db.customers.find_one({"email": "kept@example.com"})
+        assert customer["order_count"] == 2
+        assert customer["lifetime_value"] == 100
+        assert await db.customers.find_one({"email": "gone@example.com"}) is None
+
+    run_with_db(body)
@@ -0,0 +1,71 @@
+"""Reminder scan checks against a live MongoDB."""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import server
+from tests.conftest import requires_mongo
+
+pytestmark = requires_mongo
+
+
+def make_order(order_id, last_updated, **extra):
+    return {
+        "id": order_id,
+        "order_number": f"ORD-{order_id}",
+        "customer_name": f"Customer {order_id}",
+        "customer_email": f"{order_id}@example.com",
+        "amount": 100.0,
+        "last_updated": last_updated,
+        "is_archived": False,
+        "stages": {"delivered": False},
+        **extra,
+    }
+
+
+async def insert_legacy_mix(db):
+    old = datetime.now(timezone.utc) - timedelta(days=7)
+    await db.orders.insert_many([
+        make_order("iso", old.isoformat()),
+        make_order("naive-iso", old.replace(tzinfo=None).isoformat()),
+        make_order("bson-date", old),
+        make_order("unreadable", "not a date"),
+        make_order("missing", None),
+        make_order("fresh", datetime.now(timezone.utc).isoformat()),
+        make_order("archived", old.isoformat(), is_archived=True),
+        make_order("delivered", old.isoformat(), stages={"delivered": True}),
+    ])
+
+
+def test_reminders_handle_legacy_timestamps_and_skip_closed_orders(run_with_db):
+    async def body(db):
+        await insert_legacy_mix(db)
+
+        reminders = await server.find_due_reminders(db)
+
+        assert sorted(r["order_id"] for r in reminders) == ["bson-date", "iso", "naive-iso"]
+        assert all(r["days_since_update"] == 7 for r in reminders)
+
+    run_with_db(body)
+
+
+def test_digest_sends_due_orders_once_per_five_days(run_with_db, monkeypatch):
+    async def body(db):
+        await insert_legacy_mix(db)
+        sent = []
+        monkeypatch.setattr(server.resend.Emails, "send", lambda params: sent.append(params) or {"id": "stub"})
+        state = SimpleNamespace(
+            db=db,
+            resend_api_key="re_test",
+            reminder_digest_email="support@example.com",
+            sender_email="noreply@example.com",
+        )
+
+        await server.send_reminder_digest(state)
+        await server.send_reminder_digest(state)
+
+        assert len(sent) == 1
+        assert sent[0]["subject"].startswith("3 orders")
+        reminded = await db.orders.distinct("id", {"last_reminder_at": {"$exists": True}})
+        assert sorted(reminded) == ["bson-date", "iso", "naive-iso"]
+
+    run_with_db(body)